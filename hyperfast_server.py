@@ -3,87 +3,246 @@ BingX Trading Bot - FastAPI Server
 Docker Compatible Version
 """
 import asyncio
+import collections
+import gzip
+import math
 import time
-import json
 import hashlib
-import hmac
+import logging
+import logging.handlers
+import queue
+import sys
 import aiohttp
+import orjson
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
+from yarl import URL
 import os
 
 # ========== CONFIGURAÇÃO ==========
 API_KEY = os.getenv("BINGX_API_KEY")
 SECRET_KEY = os.getenv("BINGX_SECRET_KEY")
 SYMBOL = "ETH-USDT"
+# Optional: applied to both sides once at startup instead of per trade
+LEVERAGE = None
+_leverage_env = (os.getenv("LEVERAGE") or "").strip()
+if _leverage_env:
+    try:
+        LEVERAGE = int(_leverage_env)
+        if LEVERAGE <= 0:
+            raise ValueError(_leverage_env)
+    except ValueError:
+        LEVERAGE = None
+        print(f"⚠️  Invalid LEVERAGE={_leverage_env!r}, keeping the account setting")
+
+BASE_URL = "https://open-api.bingx.com"
+# Pre-parsed URL objects: aiohttp skips yarl parsing when handed a URL
+URL_TICKER = URL(f"{BASE_URL}/openApi/swap/v2/quote/ticker", encoded=True)
+URL_BALANCE = URL(f"{BASE_URL}/openApi/swap/v2/user/balance", encoded=True)
+URL_POSITIONS = URL(f"{BASE_URL}/openApi/swap/v2/user/positions", encoded=True)
+URL_ORDER = URL(f"{BASE_URL}/openApi/swap/v2/trade/order", encoded=True)
+URL_LEVERAGE = URL(f"{BASE_URL}/openApi/swap/v2/trade/leverage", encoded=True)
+
+print(
+    "🔧 Config loaded:\n"
+    f"   Symbol: {SYMBOL}\n"
+    f"   Leverage: {f'{LEVERAGE}x' if LEVERAGE else 'account setting'}\n"
+    f"   API Key: {'✅ SET' if API_KEY else '❌ MISSING'}\n"
+    f"   Secret Key: {'✅ SET' if SECRET_KEY else '❌ MISSING'}"
+)
+
+# ========== LOGGING ==========
+# QueueHandler.prepare() still formats each record on the event loop
+# (hence lazy %-args everywhere); only the stdout write happens on the
+# listener thread, so a slow log pipe never stalls a trade.
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of raising when full"""
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    """Queue listener whose stop() waits for room instead of raising when full"""
+    def enqueue_sentinel(self):
+        # The listener thread keeps draining, so this only blocks until the
+        # backlog ahead of the sentinel is written
+        self.queue.put(self._sentinel)
 
-print(f"🔧 Config loaded:")
-print(f"   Symbol: {SYMBOL}")
-print(f"   API Key: {'✅ SET' if API_KEY else '❌ MISSING'}")
-print(f"   Secret Key: {'✅ SET' if SECRET_KEY else '❌ MISSING'}")
+_log_queue = queue.Queue(maxsize=1024)
+_log_listener = _FlushingQueueListener(
+    _log_queue, logging.StreamHandler(sys.stdout)
+)
+
+log = logging.getLogger("bingx")
+log.addHandler(_DroppingQueueHandler(_log_queue))
+log.propagate = False
+# LOG_LEVEL=DEBUG restores the per-request chatter ([API], webhook bodies)
+_log_level = (os.getenv("LOG_LEVEL") or "INFO").strip().upper()
+try:
+    log.setLevel(_log_level)
+except ValueError:
+    log.setLevel(logging.INFO)
+    log.warning("⚠️  Unknown LOG_LEVEL=%r, using INFO", _log_level)
+# Resolved once: hot paths test this bool before any log.debug call
+_DEBUG = log.isEnabledFor(logging.DEBUG)
 
 # ========== HTTP CLIENT ==========
 _session = None
+_REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=5)
+_KEEP_WARM_TIMEOUT = aiohttp.ClientTimeout(total=3)
 
-async def get_session():
-    """Get HTTP session"""
+def create_session():
+    """Open the persistent keep-alive pool (called once from startup)"""
     global _session
-    if _session is None or _session.closed:
-        _session = aiohttp.ClientSession()
+    connector = aiohttp.TCPConnector(
+        limit=32,
+        limit_per_host=16,  # parallel sockets to BingX instead of queueing
+        ttl_dns_cache=300,
+        keepalive_timeout=600,
+        enable_cleanup_closed=True  # reap TLS sockets BingX half-closes
+    )
+    # BingX replies are tiny uncompressed JSON with no cookies
+    _session = aiohttp.ClientSession(
+        connector=connector,
+        headers={"Accept-Encoding": "identity"},
+        auto_decompress=False,
+        cookie_jar=aiohttp.DummyCookieJar()
+    )
+
+def get_session() -> aiohttp.ClientSession:
+    """Get HTTP session (persistent keep-alive pool)"""
     return _session
 
-def generate_signature(params: dict) -> str:
+# HMAC-SHA256 with the key pads absorbed once at import: each signature
+# only copies the inner/outer hash states (RFC 2104)
+def _hmac_pads(key: bytes):
+    if len(key) > 64:
+        key = hashlib.sha256(key).digest()
+    block = key.ljust(64, b'\x00')
+    return (
+        hashlib.sha256(bytes(b ^ 0x36 for b in block)),
+        hashlib.sha256(bytes(b ^ 0x5c for b in block))
+    )
+
+_HMAC_INNER, _HMAC_OUTER = _hmac_pads((SECRET_KEY or "").encode('utf-8'))
+
+# Signed key sets, already in BingX's canonical (sorted) order
+TIMESTAMP_SIGN_KEYS = ("timestamp",)
+LEVERAGE_SIGN_KEYS = ("leverage", "side", "symbol", "timestamp")
+
+def build_query(params: dict, keys=None) -> bytearray:
+    """Build the canonical query string that BingX signs"""
+    if keys is None:
+        keys = sorted(params)
+    query = bytearray()
+    for key in keys:
+        if query:
+            query += b'&'
+        query += f"{key}={params[key]}".encode('utf-8')
+    return query
+
+def timestamp_ms() -> int:
+    """Wall-clock milliseconds for the BingX timestamp field"""
+    return time.time_ns() // 1_000_000
+
+def sign_query(query) -> str:
+    """HMAC-SHA256 hex digest of an already canonical query string"""
+    inner = _HMAC_INNER.copy()
+    inner.update(query)
+    outer = _HMAC_OUTER.copy()
+    outer.update(inner.digest())
+    return outer.hexdigest()
+
+def generate_signature(params: dict, keys=None) -> str:
     """Generate HMAC signature for BingX API"""
-    query_string = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
-    return hmac.new(
-        SECRET_KEY.encode('utf-8'),
-        query_string.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-
-async def bingx_request(method: str, endpoint: str, params=None, signed=False):
-    """Make request to BingX API"""
+    return sign_query(build_query(params, keys))
+
+def sign_order(side: str, position_side: str, quantity: float, timestamp: int) -> str:
+    """Sign a market order (fields formatted directly in sorted-key order)"""
+    return sign_query(
+        f"positionSide={position_side}&quantity={quantity}&side={side}"
+        f"&symbol={SYMBOL}&timestamp={timestamp}&type=MARKET".encode('utf-8')
+    )
+
+# Success marker at the head of a compact BingX response
+_CODE_OK = b'"code":0,'
+
+async def bingx_request(method: str, url: URL, params=None, signed=False, sign_keys=None,
+                        raw=False, payload=None):
+    """Make request to BingX API (raw=True returns the body bytes on success)
+
+    payload: pre-serialized, already signed POST body; params are then ignored
+    """
     try:
-        session = await get_session()
-        url = f"https://open-api.bingx.com{endpoint}"
+        session = get_session()
         
         if params is None:
             params = {}
         
-        if signed:
-            params['timestamp'] = int(time.time() * 1000)
-            params['signature'] = generate_signature(params)
+        if signed and payload is None:
+            params['timestamp'] = timestamp_ms()
+            if method == "GET":
+                # Send the exact query string that was signed, already encoded
+                query = build_query(params, sign_keys)
+                url = URL(
+                    f"{url}?{query.decode('utf-8')}&signature={sign_query(query)}",
+                    encoded=True
+                )
+                params = None
+            else:
+                params['signature'] = generate_signature(params, sign_keys)
         
         headers = {"X-BX-APIKEY": API_KEY} if signed else {}
+        if method == "POST":
+            headers["Content-Type"] = "application/json"
+            if payload is None:
+                payload = orjson.dumps(params)
         
-        print(f"[API] {method} {endpoint}")
+        if _DEBUG:
+            log.debug("[API] %s %s", method, url)
         
         async with session.request(
             method=method,
             url=url,
-            params=params if method == "GET" else None,
-            json=params if method == "POST" else None,
+            params=params if method == "GET" else None,  # unsigned GETs only
+            data=payload,
             headers=headers,
-            timeout=aiohttp.ClientTimeout(total=5)
+            timeout=_REQUEST_TIMEOUT
         ) as response:
             if response.status == 200:
-                data = await response.json()
+                body = await response.read()
+                if raw and _CODE_OK in body[:64]:
+                    return body
+                data = orjson.loads(body)
                 if data.get('code') == 0:
-                    return data.get('data')
+                    return body if raw else data.get('data')
                 else:
-                    print(f"[API ERROR] Code: {data.get('code')}, Msg: {data.get('msg')}")
+                    log.error("[API ERROR] Code: %s, Msg: %s", data.get('code'), data.get('msg'))
                     return None
             else:
-                print(f"[API ERROR] HTTP {response.status}")
+                log.error("[API ERROR] HTTP %s", response.status)
                 return None
                 
     except Exception as e:
-        print(f"[API EXCEPTION] {str(e)}")
+        log.error("[API EXCEPTION] %s", e)
         return None
 
 # ========== TRADING FUNCTIONS ==========
+PRICE_CACHE_TTL = 2.0  # seconds; the ticker stream refreshes it about every second
+
+# (price, monotonic updated_at) - rebound as a whole so readers never see a torn pair
+_price_cache = (0.0, 0.0)
+
 async def get_current_price():
     """Get current ETH-USDT price"""
-    data = await bingx_request("GET", "/openApi/swap/v2/quote/ticker", {"symbol": SYMBOL})
+    global _price_cache
+    price, updated = _price_cache
+    if price > 0 and time.monotonic() - updated < PRICE_CACHE_TTL:
+        return price
+    
+    data = await bingx_request("GET", URL_TICKER, {"symbol": SYMBOL})
     
     if data:
         if isinstance(data, list) and len(data) > 0:
@@ -93,66 +252,149 @@ async def get_current_price():
         else:
             price = 0.0
         
-        print(f"[PRICE] ETH-USDT: ${price}")
+        _price_cache = (price, time.monotonic())
+        if _DEBUG:
+            log.debug("[PRICE] ETH-USDT: $%s", price)
         return price
     
     return 0.0
 
-async def get_account_balance():
-    """Get account balance"""
-    data = await bingx_request("GET", "/openApi/swap/v2/user/balance", signed=True)
+BALANCE_CACHE_TTL = 10.0  # seconds; the refresh loop renews it every BALANCE_REFRESH_INTERVAL
+BALANCE_REFRESH_INTERVAL = 3
+BALANCE_FETCH_TIMEOUT = 0.5  # max wait for a fresh balance when a stale one exists
+
+# (balance, monotonic updated_at), same layout as _price_cache
+_balance_cache = (0.0, 0.0)
+
+async def fetch_account_balance():
+    """Fetch USDT balance from BingX and refresh the cache"""
+    global _balance_cache
+    data = await bingx_request(
+        "GET", URL_BALANCE, signed=True, sign_keys=TIMESTAMP_SIGN_KEYS
+    )
     
     if data and 'balance' in data:
         for asset in data['balance']:
             if asset.get('asset') == 'USDT':
                 balance = float(asset.get('balance', 0))
-                print(f"[BALANCE] USDT: ${balance}")
+                if balance != _balance_cache[0]:
+                    log.info("[BALANCE] USDT: $%s", balance)
+                _balance_cache = (balance, time.monotonic())
                 return balance
     
     return 0.0
 
+async def get_account_balance():
+    """Get account balance (cached, refreshed in the background)"""
+    balance, updated = _balance_cache
+    if not updated:
+        return await fetch_account_balance()
+    if time.monotonic() - updated < BALANCE_CACHE_TTL:
+        return balance
+    
+    try:
+        # shield: a timeout must not cancel the request and drop its pooled socket
+        fresh = await asyncio.wait_for(
+            asyncio.shield(fetch_account_balance()), BALANCE_FETCH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        log.warning("[BALANCE] Refresh timed out, using cached $%s", balance)
+        return balance
+    
+    if not fresh:
+        log.warning("[BALANCE] Refresh failed, using cached $%s", balance)
+        return balance
+    return fresh
+
+_balance_refetch = None  # post-fill refetch task, at most one at a time
+
+def refetch_balance_soon():
+    """Refetch the balance in the background after a fill; trades never wait on it"""
+    global _balance_refetch
+    if _balance_refetch is None or _balance_refetch.done():
+        _balance_refetch = asyncio.create_task(fetch_account_balance())
+
+async def refresh_balance():
+    """Keep the balance cache fresh so trades never wait on it"""
+    while True:
+        await asyncio.sleep(BALANCE_REFRESH_INTERVAL)
+        try:
+            await fetch_account_balance()
+        except Exception as e:
+            log.warning("[BALANCE] %s", e)
+
 async def get_position():
     """Get current position"""
-    data = await bingx_request("GET", "/openApi/swap/v2/user/positions", signed=True)
+    data = await bingx_request(
+        "GET", URL_POSITIONS, signed=True, sign_keys=TIMESTAMP_SIGN_KEYS
+    )
     
     if data:
         if isinstance(data, list):
             for pos in data:
                 if pos.get('symbol') == SYMBOL:
-                    print(f"[POSITION] Found: {pos.get('positionAmt', 0)} ETH")
+                    log.info("[POSITION] Found: %s ETH", pos.get('positionAmt', 0))
                     return pos
         elif isinstance(data, dict) and data.get('symbol') == SYMBOL:
-            print(f"[POSITION] Found: {data.get('positionAmt', 0)} ETH")
+            log.info("[POSITION] Found: %s ETH", data.get('positionAmt', 0))
             return data
     
-    print("[POSITION] No position found")
+    log.info("[POSITION] No position found")
     return None
 
-async def place_market_order(side: str, quantity: float):
-    """Place market order"""
-    params = {
-        "symbol": SYMBOL,
-        "side": side.upper(),
-        "type": "MARKET",
-        "quantity": round(quantity, 4),
-        "positionSide": "LONG" if side.upper() == "BUY" else "SHORT"
-    }
-    
-    print(f"[ORDER] {side.upper()} {quantity} ETH")
-    
-    result = await bingx_request("POST", "/openApi/swap/v2/trade/order", params, signed=True)
-    
-    if result and 'orderId' in result:
-        print(f"[ORDER SUCCESS] ID: {result['orderId']}")
+async def place_market_order(side: str, quantity: float, position_side: str = None):
+    """Place market order (position_side defaults to the side being opened)"""
+    side = side.upper()
+    if position_side is None:
+        position_side = "LONG" if side == "BUY" else "SHORT"
+    quantity = round(quantity, 4)
+    timestamp = timestamp_ms()
+    signature = sign_order(side, position_side, quantity, timestamp)
+    # Fixed-shape JSON formatted directly; the values match the signed query
+    payload = (
+        f'{{"symbol":"{SYMBOL}","side":"{side}","type":"MARKET","quantity":{quantity},'
+        f'"positionSide":"{position_side}","timestamp":{timestamp},"signature":"{signature}"}}'
+    ).encode('utf-8')
+    
+    log.info("[ORDER] %s %s ETH", side, quantity)
+    
+    result = await bingx_request("POST", URL_ORDER, signed=True, raw=True, payload=payload)
+    
+    if result:
+        log.info("[ORDER SUCCESS] %s", result.decode('utf-8', 'replace'))
+        refetch_balance_soon()
         return True
     else:
-        print("[ORDER FAILED]")
+        log.error("[ORDER FAILED]")
         return False
 
+async def set_leverage():
+    """Set LEVERAGE on both position sides (startup only, off the trade path)"""
+    results = await asyncio.gather(*(
+        bingx_request("POST", URL_LEVERAGE, {
+            "symbol": SYMBOL,
+            "side": side,
+            "leverage": LEVERAGE
+        }, signed=True, sign_keys=LEVERAGE_SIGN_KEYS)
+        for side in ("LONG", "SHORT")
+    ))
+    failed = [side for side, result in zip(("LONG", "SHORT"), results) if result is None]
+    if failed:
+        log.error("[LEVERAGE] Failed to set %sx on %s %s", LEVERAGE, SYMBOL, '/'.join(failed))
+    else:
+        log.info("[LEVERAGE] %s set to %sx", SYMBOL, LEVERAGE)
+
 # ========== SIGNAL PROCESSING ==========
+# Quantities opened by this process, keyed by position side ("LONG"/"SHORT").
+# Lets EXIT signals close blind; unknown sides fall back to /user/positions.
+_open_positions = {}
+# Trades run as background tasks: an EXIT must not overtake the ENTER
+# it closes, so every enter/exit holds the lock of its side
+_side_locks = {"LONG": asyncio.Lock(), "SHORT": asyncio.Lock()}
+
 async def process_signal(action: str):
     """Process trading signal"""
-    print(f"[SIGNAL] Processing: {action}")
+    log.info("[SIGNAL] Processing: %s", action)
     
     if action == "ENTER-LONG":
         return await enter_long()
@@ -167,204 +409,480 @@ async def process_signal(action: str):
     else:
         return {"success": False, "error": "Unknown action"}
 
+BALANCE_FRACTION = 0.4  # 40% of balance per entry
+
+def calculate_quantity(usd_amount: float, price: float) -> float:
+    """ETH quantity for a USD amount, at BingX's 4-decimal step"""
+    return round(usd_amount / price, 4)
+
 async def enter_long():
     """Open LONG position"""
-    print("[TRADE] Opening LONG position...")
-    
-    balance = await get_account_balance()
-    price = await get_current_price()
-    
-    print(f"[TRADE DATA] Balance: ${balance}, Price: ${price}")
-    
-    if balance <= 0 or price <= 0:
-        return {"success": False, "error": "Invalid balance or price"}
-    
-    # 40% of balance
-    usd_amount = balance * 0.4
-    quantity = round(usd_amount / price, 4)
-    
-    if quantity <= 0:
-        return {"success": False, "error": "Invalid quantity"}
-    
-    print(f"[TRADE] Buying {quantity} ETH (${usd_amount})")
-    
-    success = await place_market_order("BUY", quantity)
-    return {"success": success}
+    async with _side_locks["LONG"]:
+        log.info("[TRADE] Opening LONG position...")
+        
+        balance, price = await asyncio.gather(get_account_balance(), get_current_price())
+        
+        if _DEBUG:
+            log.debug("[TRADE DATA] Balance: $%s, Price: $%s", balance, price)
+        
+        if balance <= 0 or price <= 0:
+            return {"success": False, "error": "Invalid balance or price"}
+        
+        usd_amount = balance * BALANCE_FRACTION
+        quantity = calculate_quantity(usd_amount, price)
+        
+        if quantity <= 0:
+            return {"success": False, "error": "Invalid quantity"}
+        
+        log.info("[TRADE] Buying %s ETH ($%s)", quantity, usd_amount)
+        
+        success = await place_market_order("BUY", quantity)
+        if success:
+            _open_positions["LONG"] = _open_positions.get("LONG", 0) + quantity
+        return {"success": success}
 
 async def enter_short():
     """Open SHORT position"""
-    print("[TRADE] Opening SHORT position...")
-    
-    balance = await get_account_balance()
-    price = await get_current_price()
-    
-    print(f"[TRADE DATA] Balance: ${balance}, Price: ${price}")
-    
-    if balance <= 0 or price <= 0:
-        return {"success": False, "error": "Invalid balance or price"}
-    
-    usd_amount = balance * 0.4
-    quantity = round(usd_amount / price, 4)
-    
-    if quantity <= 0:
-        return {"success": False, "error": "Invalid quantity"}
-    
-    print(f"[TRADE] Selling {quantity} ETH (${usd_amount})")
-    
-    success = await place_market_order("SELL", quantity)
-    return {"success": success}
+    async with _side_locks["SHORT"]:
+        log.info("[TRADE] Opening SHORT position...")
+        
+        balance, price = await asyncio.gather(get_account_balance(), get_current_price())
+        
+        if _DEBUG:
+            log.debug("[TRADE DATA] Balance: $%s, Price: $%s", balance, price)
+        
+        if balance <= 0 or price <= 0:
+            return {"success": False, "error": "Invalid balance or price"}
+        
+        usd_amount = balance * BALANCE_FRACTION
+        quantity = calculate_quantity(usd_amount, price)
+        
+        if quantity <= 0:
+            return {"success": False, "error": "Invalid quantity"}
+        
+        log.info("[TRADE] Selling %s ETH ($%s)", quantity, usd_amount)
+        
+        success = await place_market_order("SELL", quantity)
+        if success:
+            _open_positions["SHORT"] = _open_positions.get("SHORT", 0) + quantity
+        return {"success": success}
+
+def position_amount(position) -> float:
+    """Signed positionAmt of a BingX position (0.0 when there is none)"""
+    if not position:
+        return 0.0
+    return float(position.get('positionAmt') or 0)
 
 async def exit_position(side: str):
     """Close specific position"""
-    print(f"[TRADE] Closing {side} position...")
+    async with _side_locks[side]:
+        log.info("[TRADE] Closing %s position...", side)
+        
+        tracked = _open_positions.pop(side, None)
+        if tracked:
+            result = await close_tracked_position(side, tracked)
+            if result["success"]:
+                return result
+        
+        return await close_exchange_position(side)
+
+async def exit_all_positions():
+    """Close all positions"""
+    async with _side_locks["LONG"], _side_locks["SHORT"]:
+        log.info("[TRADE] Closing ALL positions...")
+        
+        if _open_positions:
+            results = []
+            for side in list(_open_positions):
+                result = await close_tracked_position(side, _open_positions.pop(side))
+                if not result["success"]:
+                    result = await close_exchange_position(side)
+                results.append(result)
+            return {"success": all(r["success"] for r in results)}
+        
+        amount = position_amount(await get_position())
+        
+        if amount == 0:
+            return {"success": True, "message": "No open positions"}
+        
+        quantity = math.fabs(amount)
+        position_side = "LONG" if amount > 0 else "SHORT"
+        side = "SELL" if amount > 0 else "BUY"
+        
+        log.info("[TRADE] Closing all: %s ETH (%s → %s)", quantity, position_side, side)
+        
+        success = await place_market_order(side, quantity, position_side)
+        return {"success": success}
+
+async def close_tracked_position(side: str, quantity: float):
+    """Close a locally tracked position without querying BingX first"""
+    close_side = "SELL" if side == "LONG" else "BUY"
     
-    position = await get_position()
+    log.info("[TRADE] Blind close: %s ETH (%s → %s)", quantity, side, close_side)
     
-    if not position or float(position.get('positionAmt', 0)) == 0:
+    success = await place_market_order(close_side, quantity, side)
+    if not success:
+        # Tracked size may be stale (liquidation, manual close, partial
+        # fill): the caller re-checks BingX instead of retrying blind
+        log.warning("[TRADE] Blind close of %s failed, checking BingX position...", side)
+    return {"success": success}
+
+async def close_exchange_position(side: str):
+    """Close a position side as reported by /user/positions"""
+    amount = position_amount(await get_position())
+    
+    if amount == 0:
         return {"success": True, "message": "No position to close"}
     
-    current_side = "LONG" if float(position.get('positionAmt', 0)) > 0 else "SHORT"
+    current_side = "LONG" if amount > 0 else "SHORT"
     
-    if (side == "LONG" and current_side == "SHORT") or (side == "SHORT" and current_side == "LONG"):
+    if side != current_side:
         return {"success": True, "message": "Position side mismatch"}
     
-    quantity = abs(float(position.get('positionAmt', 0)))
+    quantity = math.fabs(amount)
     close_side = "SELL" if current_side == "LONG" else "BUY"
     
-    print(f"[TRADE] Closing {quantity} ETH ({current_side} → {close_side})")
+    log.info("[TRADE] Closing %s ETH (%s → %s)", quantity, current_side, close_side)
     
-    success = await place_market_order(close_side, quantity)
+    success = await place_market_order(close_side, quantity, current_side)
     return {"success": success}
 
-async def exit_all_positions():
-    """Close all positions"""
-    print("[TRADE] Closing ALL positions...")
-    
-    position = await get_position()
-    
-    if not position or float(position.get('positionAmt', 0)) == 0:
-        return {"success": True, "message": "No open positions"}
-    
-    quantity = abs(float(position.get('positionAmt', 0)))
-    side = "SELL" if float(position.get('positionAmt', 0)) > 0 else "BUY"
-    
-    print(f"[TRADE] Closing all: {quantity} ETH ({side})")
-    
-    success = await place_market_order(side, quantity)
-    return {"success": success}
+# ========== PRICE STREAM ==========
+WS_URL = "wss://open-api-swap.bingx.com/swap-market"
+_WS_SUBSCRIBE = orjson.dumps({
+    "id": "ticker",
+    "reqType": "sub",
+    "dataType": f"{SYMBOL}@ticker"
+}).decode()
+
+WS_RETRY_MIN = 1  # seconds
+WS_RETRY_MAX = 30
+
+async def price_stream():
+    """Keep the price cache fed from the BingX ticker WebSocket"""
+    global _price_cache
+    retry = WS_RETRY_MIN
+    while True:
+        try:
+            session = get_session()
+            async with session.ws_connect(WS_URL, heartbeat=20) as ws:
+                await ws.send_str(_WS_SUBSCRIBE)
+                log.info("[WS] Subscribed to %s ticker", SYMBOL)
+                retry = WS_RETRY_MIN
+                
+                async for msg in ws:
+                    # BingX gzips every frame
+                    if msg.type == aiohttp.WSMsgType.BINARY:
+                        payload = gzip.decompress(msg.data)
+                    elif msg.type == aiohttp.WSMsgType.TEXT:
+                        payload = msg.data.encode('utf-8')
+                    else:
+                        break
+                    
+                    if payload == b"Ping":
+                        await ws.send_str("Pong")
+                        continue
+                    
+                    data = orjson.loads(payload).get("data")
+                    if data and "c" in data:
+                        _price_cache = (float(data["c"]), time.monotonic())
+            
+            log.warning("[WS] Connection closed, reconnecting in %ss...", retry)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error("[WS ERROR] %s, reconnecting in %ss...", e, retry)
+        
+        await asyncio.sleep(retry)
+        retry = min(retry * 2, WS_RETRY_MAX)
+
+# ========== CONNECTION WARM-UP ==========
+KEEP_WARM_INTERVAL = 13  # seconds, below BingX's idle keep-alive window
+WARM_CONNECTIONS = 3  # sockets opened in parallel at startup
+
+async def ping_ticker():
+    """Cheap public GET that opens (or refreshes) a pooled BingX socket"""
+    session = get_session()
+    async with session.get(
+        URL_TICKER,
+        params={"symbol": SYMBOL},
+        timeout=_KEEP_WARM_TIMEOUT
+    ) as response:
+        await response.read()
+
+async def warm_up_connections():
+    """Open pooled TLS connections to BingX before the first signal"""
+    log.info("[WARMUP] Opening %s connections to BingX...", WARM_CONNECTIONS)
+    jobs = [ping_ticker() for _ in range(WARM_CONNECTIONS)]
+    if API_KEY and SECRET_KEY:
+        jobs.append(get_account_balance())
+    
+    # Concurrent requests force separate sockets instead of reusing one
+    for result in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(result, Exception):
+            log.warning("[WARMUP] %s", result)
+
+async def keep_connection_warm():
+    """Ping BingX periodically so the pooled socket never idles out"""
+    while True:
+        await asyncio.sleep(KEEP_WARM_INTERVAL)
+        try:
+            await ping_ticker()
+        except Exception as e:
+            log.warning("[KEEPALIVE] %s", e)
 
 # ========== FASTAPI APP ==========
-app = FastAPI(title="BingX Trading Bot", version="1.0")
+app = FastAPI(
+    title="BingX Trading Bot",
+    version="1.0",
+    default_response_class=ORJSONResponse,
+    # No schema/docs routes: nothing to build at startup or to match per request
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None
+)
 
+# Last SEEN_SIGNALS message hashes: the set answers membership, the ring
+# remembers insertion order so the oldest hash is evicted one at a time
+SEEN_SIGNALS = 256
 _processed_signals = set()
+_processed_ring = [None] * SEEN_SIGNALS
+_processed_idx = 0
+
+_background_tasks = set()
+# (token, action) in the precedence order of the original if/elif chain:
+# a message naming several actions resolves to the earliest here - do not reorder
+_ACTIONS = (
+    (b"ENTER-LONG", "ENTER-LONG"),
+    (b"EXIT-LONG", "EXIT-LONG"),
+    (b"ENTER-SHORT", "ENTER-SHORT"),
+    (b"EXIT-SHORT", "EXIT-SHORT"),
+    (b"EXIT-ALL", "EXIT-ALL")
+)
+_ACTION_RANK = {token: rank for rank, (token, _) in enumerate(_ACTIONS)}
+
+# Constant webhook replies, serialized once
+_BODY_INVALID_MESSAGE = orjson.dumps({"error": "Empty or invalid message"})
+_BODY_UNKNOWN_ACTION = orjson.dumps({"error": "Unknown action"})
+_BODY_DUPLICATE = orjson.dumps({"status": "duplicate"})
+_BODY_DEDUPED = orjson.dumps({"status": "deduped"})
+_BODY_BUSY = orjson.dumps({"error": "Too many trades in flight"})
+_BODY_TOO_LARGE = orjson.dumps({"error": "Message too large"})
+_BODY_BAD_LENGTH = orjson.dumps({"error": "Invalid Content-Length"})
+
+_BODY_ROOT = orjson.dumps({
+    "service": "BingX Ultra-Fast Trading Bot",
+    "status": "🟢 ONLINE",
+    "version": "1.0.0",
+    "docker": True,
+    "endpoints": {
+        "webhook": "POST /webhook - TradingView signals",
+        "status": "GET /status - Health check",
+        "orders": "GET /orders - Recent signal outcomes",
+        "test": "GET /test - Connection test"
+    },
+    "instructions": {
+        "tradingview": "Webhook URL: https://bingx-ultra-fast-trading-bot.onrender.com/webhook",
+        "message": "Use: {{strategy.order.comment}}"
+    }
+})
+
+MAX_WEBHOOK_BODY = 1024  # bytes; TradingView alerts are a few dozen
+
+MAX_TRADES_IN_FLIGHT = 8
+_trades_in_flight = 0
+_signal_tasks = set()  # strong refs so running trades are not garbage collected
+_recent_failures = collections.deque(maxlen=20)  # shown on /status
+_recent_orders = collections.deque(maxlen=50)  # every outcome, shown on /orders
+
+SIGNAL_COALESCE_WINDOW_NS = 500_000_000  # same action again inside it is dropped
+_inflight = {}  # action -> monotonic_ns deadline
+
+_RULE = "=" * 60
+_STARTUP_BANNER = (
+    f"\n{_RULE}\n"
+    "✅ SERVER STARTED SUCCESSFULLY\n"
+    f"{_RULE}\n"
+    "🌐 External URL: https://bingx-ultra-fast-trading-bot.onrender.com\n"
+    "📡 Webhook: POST /webhook\n"
+    "🏥 Health: GET /status\n"
+    f"{_RULE}\n"
+    "\n📢 WAITING FOR TRADINGVIEW SIGNALS...\n"
+)
 
 @app.on_event("startup")
 async def startup():
     """Server startup"""
-    print("\n" + "=" * 60)
-    print("✅ SERVER STARTED SUCCESSFULLY")
-    print("=" * 60)
-    print(f"🌐 External URL: https://bingx-ultra-fast-trading-bot.onrender.com")
-    print(f"📡 Webhook: POST /webhook")
-    print(f"🏥 Health: GET /status")
-    print("=" * 60)
-    print("\n📢 WAITING FOR TRADINGVIEW SIGNALS...\n")
+    _log_listener.start()
+    create_session()
+    await warm_up_connections()
+    if LEVERAGE and API_KEY and SECRET_KEY:
+        await set_leverage()
+    _background_tasks.add(asyncio.create_task(keep_connection_warm()))
+    _background_tasks.add(asyncio.create_task(price_stream()))
+    if API_KEY and SECRET_KEY:
+        _background_tasks.add(asyncio.create_task(refresh_balance()))
+
+    print(_STARTUP_BANNER)
 
 @app.on_event("shutdown")
 async def shutdown():
     """Server shutdown"""
     print("\n👋 Server shutting down...")
+    for task in _background_tasks:
+        task.cancel()
+    # Let accepted trades reach BingX before the session closes
+    if _signal_tasks:
+        await asyncio.wait(_signal_tasks, timeout=5)
     global _session
     if _session:
         await _session.close()
+    _log_listener.stop()
+
+async def run_signal(action: str, start: int):
+    """Execute a signal accepted by the webhook and record the outcome"""
+    global _trades_in_flight
+    try:
+        result = await process_signal(action)
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    finally:
+        _trades_in_flight -= 1
+    elapsed_us = (time.monotonic_ns() - start) // 1_000
+    outcome = {
+        "action": action,
+        "success": bool(result.get("success")),
+        "latency_us": elapsed_us,
+        "timestamp": time.time()
+    }
+    
+    if outcome["success"]:
+        log.info("✅ Action '%s' executed successfully! (%sµs)", action, elapsed_us)
+    else:
+        outcome["error"] = result.get("error", "Unknown error")
+        log.error("❌ Action '%s' failed: %s (%sµs)", action, outcome['error'], elapsed_us)
+        _recent_failures.append(outcome)
+    _recent_orders.append(outcome)
+
+def parse_action(body: bytes):
+    """Action named in a webhook body, by _ACTIONS precedence (None if none)"""
+    # TradingView sends "<ACTION>_...": a known leading token only has to be
+    # checked against higher-precedence tokens (none at all for ENTER-LONG)
+    rank = _ACTION_RANK.get(body.partition(b"_")[0], len(_ACTIONS))
+    for token, action in _ACTIONS[:rank]:
+        if token in body:
+            return action
+    return _ACTIONS[rank][1] if rank < len(_ACTIONS) else None
+
+async def read_webhook_body(request: Request):
+    """Read the request body, or None as soon as it exceeds MAX_WEBHOOK_BODY"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_WEBHOOK_BODY:
+            return None
+    return bytes(body)
 
 # ========== ROUTES ==========
 @app.post("/webhook")
 async def webhook(request: Request):
     """TradingView webhook endpoint"""
-    print("\n" + "=" * 50)
-    print("📨 WEBHOOK RECEIVED")
+    global _trades_in_flight, _processed_idx
+    start = time.monotonic_ns()
+    if _DEBUG:
+        log.debug("📨 WEBHOOK RECEIVED")
     
     try:
-        # Read message
-        body = await request.body()
-        message = body.decode('utf-8').strip()
+        # Refuse declared oversized bodies before reading them
+        try:
+            declared = int(request.headers.get("content-length", 0))
+        except ValueError:
+            log.warning("🚫 Rejected webhook: invalid Content-Length")
+            return Response(
+                content=_BODY_BAD_LENGTH,
+                media_type="application/json",
+                status_code=400
+            )
         
-        print(f"📝 Message: {message}")
+        # Read message; the cap is enforced again while reading because
+        # chunked requests carry no Content-Length
+        body = None
+        if declared <= MAX_WEBHOOK_BODY:
+            body = await read_webhook_body(request)
+        if body is None:
+            log.warning("🚫 Rejected webhook: body over %s bytes", MAX_WEBHOOK_BODY)
+            return Response(
+                content=_BODY_TOO_LARGE,
+                media_type="application/json",
+                status_code=413
+            )
+        body = body.strip()
+        
+        if _DEBUG:
+            log.debug("📝 Message: %s", body.decode('utf-8', 'replace'))
         
         # Validate format
-        if not message or len(message) < 10:
+        if len(body) < 10:
+            log.warning("🚫 Rejected webhook: empty or invalid message (%s bytes)", len(body))
             return Response(
-                content=json.dumps({"error": "Empty or invalid message"}),
+                content=_BODY_INVALID_MESSAGE,
                 media_type="application/json",
                 status_code=400
             )
         
-        # Extract action
-        action = None
-        if "ENTER-LONG" in message:
-            action = "ENTER-LONG"
-        elif "EXIT-LONG" in message:
-            action = "EXIT-LONG"
-        elif "ENTER-SHORT" in message:
-            action = "ENTER-SHORT"
-        elif "EXIT-SHORT" in message:
-            action = "EXIT-SHORT"
-        elif "EXIT-ALL" in message:
-            action = "EXIT-ALL"
+        action = parse_action(body)
         
         if not action:
+            log.warning("🚫 Rejected webhook: unknown action in %r",
+                        body[:100].decode('utf-8', 'replace'))
             return Response(
-                content=json.dumps({"error": "Unknown action"}),
+                content=_BODY_UNKNOWN_ACTION,
                 media_type="application/json",
                 status_code=400
             )
         
-        # Check duplicate (simple hash)
-        msg_hash = hash(message)
+        # Fast-fail instead of piling trades onto a stalled exchange
+        if _trades_in_flight >= MAX_TRADES_IN_FLIGHT:
+            log.warning("🚦 %s trades in flight, rejecting '%s'", _trades_in_flight, action)
+            return Response(
+                content=_BODY_BUSY,
+                media_type="application/json",
+                status_code=429
+            )
+        
+        # Check duplicate (stable 64-bit digest, not the per-process hash())
+        msg_hash = hashlib.blake2b(body, digest_size=8).digest()
         if msg_hash in _processed_signals:
-            print("⚠️  Duplicate signal, ignoring...")
+            log.warning("⚠️  Duplicate signal, ignoring...")
             return Response(
-                content=json.dumps({"status": "duplicate"}),
+                content=_BODY_DUPLICATE,
                 media_type="application/json"
             )
         
+        _processed_signals.discard(_processed_ring[_processed_idx])
+        _processed_ring[_processed_idx] = msg_hash
         _processed_signals.add(msg_hash)
-        if len(_processed_signals) > 100:
-            _processed_signals.clear()
+        _processed_idx = (_processed_idx + 1) % SEEN_SIGNALS
         
-        # Process signal
-        result = await process_signal(action)
-        
-        if result.get("success"):
-            print(f"✅ Action '{action}' executed successfully!")
+        # Coalesce rapid-fire repeats of the same action
+        if start < _inflight.get(action, 0):
+            log.warning("⚠️  '%s' already in flight, ignoring...", action)
             return Response(
-                content=json.dumps({
-                    "status": "success",
-                    "action": action,
-                    "message": "Trade executed"
-                }),
+                content=_BODY_DEDUPED,
                 media_type="application/json"
             )
-        else:
-            print(f"❌ Action '{action}' failed: {result.get('error')}")
-            return Response(
-                content=json.dumps({
-                    "status": "error",
-                    "action": action,
-                    "error": result.get("error", "Unknown error")
-                }),
-                media_type="application/json",
-                status_code=500
-            )
+        _inflight[action] = start + SIGNAL_COALESCE_WINDOW_NS
+        
+        # Accept now, trade in the background: TradingView only needs a 2xx
+        _trades_in_flight += 1
+        task = asyncio.create_task(run_signal(action, start))
+        _signal_tasks.add(task)
+        task.add_done_callback(_signal_tasks.discard)
+        return Response(status_code=204)
             
     except Exception as e:
-        print(f"💥 Webhook error: {str(e)}")
-        return Response(
-            content=json.dumps({"error": str(e)}),
-            media_type="application/json",
-            status_code=500
-        )
+        log.error("💥 Webhook error: %s", e)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 @app.get("/status")
 async def status():
@@ -376,6 +894,8 @@ async def status():
             "service": "BingX Trading Bot",
             "symbol": SYMBOL,
             "price": price,
+            "trades_in_flight": _trades_in_flight,
+            "recent_failures": list(_recent_failures),
             "timestamp": time.time()
         }
     except Exception as e:
@@ -385,24 +905,15 @@ async def status():
             "timestamp": time.time()
         }
 
+@app.get("/orders")
+async def orders():
+    """Outcomes of the most recent signals, newest last"""
+    return {"orders": list(_recent_orders)}
+
 @app.get("/")
 async def root():
     """Home page"""
-    return {
-        "service": "BingX Ultra-Fast Trading Bot",
-        "status": "🟢 ONLINE",
-        "version": "1.0.0",
-        "docker": True,
-        "endpoints": {
-            "webhook": "POST /webhook - TradingView signals",
-            "status": "GET /status - Health check",
-            "test": "GET /test - Connection test"
-        },
-        "instructions": {
-            "tradingview": "Webhook URL: https://bingx-ultra-fast-trading-bot.onrender.com/webhook",
-            "message": "Use: {{strategy.order.comment}}"
-        }
-    }
+    return Response(content=_BODY_ROOT, media_type="application/json")
 
 @app.get("/test")
 async def test():
@@ -5,24 +5,23 @@ BingX Trading Bot - Docker Version
 import os
 import sys
 
-print("=" * 60)
-print("🐳 BINGX TRADING BOT - DOCKER VERSION")
-print("=" * 60)
+_RULE = "=" * 60
+print(f"{_RULE}\n🐳 BINGX TRADING BOT - DOCKER VERSION\n{_RULE}")
 
 # Verificar variáveis
 if not os.getenv('BINGX_API_KEY'):
-    print("❌ ERROR: BINGX_API_KEY not configured!")
-    print("Set in Render Dashboard → Environment")
+    print("❌ ERROR: BINGX_API_KEY not configured!\nSet in Render Dashboard → Environment")
     sys.exit(1)
 
 if not os.getenv('BINGX_SECRET_KEY'):
-    print("❌ ERROR: BINGX_SECRET_KEY not configured!")
-    print("Set in Render Dashboard → Environment")
+    print("❌ ERROR: BINGX_SECRET_KEY not configured!\nSet in Render Dashboard → Environment")
     sys.exit(1)
 
-print("✅ API credentials loaded")
-print(f"🌐 External URL: https://bingx-ultra-fast-trading-bot.onrender.com")
-print(f"🔌 Internal URL: http://0.0.0.0:{os.getenv('PORT', 8000)}")
+print(
+    "✅ API credentials loaded\n"
+    "🌐 External URL: https://bingx-ultra-fast-trading-bot.onrender.com\n"
+    f"🔌 Internal URL: http://0.0.0.0:{os.getenv('PORT', 8000)}"
+)
 
 # Importar app
 from hyperfast_server import app
@@ -37,7 +36,12 @@ if __name__ == "__main__":
         app,
         host="0.0.0.0",  # IMPORTANTE: Docker precisa de 0.0.0.0
         port=port,
+        loop="uvloop",  # uvicorn[standard]: event loop em C (libuv)
+        http="httptools",
         workers=1,
-        access_log=True,
+        timeout_keep_alive=75,  # reutiliza conexões do proxy/TradingView
+        access_log=False,  # o bot loga cada sinal aceito e cada webhook rejeitado
+        server_header=False,
+        date_header=False,
         log_level="info"
     )